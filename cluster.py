@@ -1,134 +1,361 @@
 #!/usr/bin/env python3
 
-import yaml
-import subprocess
 import sys
 import os
-import argparse
+import collections
+import functools
 import json
 import shutil
 import socket
 import logging
+import time
 from pathlib import Path
 
+# subprocess, hashlib, pickle and concurrent.futures are imported where they are used,
+# so that listing sessions doesn't pay for them
+
+try:
+    from orjson import loads as _json_loads, dumps as _json_dumps
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(data):
+        return json.dumps(data, separators=(",", ":")).encode()
+
 TEMP_DIRECTORY = Path.home() / ".config/ansible-sample-conf"
-MEMO_FILE = f"{TEMP_DIRECTORY}/cluster_session.json"
+MEMO_FILE = TEMP_DIRECTORY / "cluster_session.json"
+INVENTORY_CACHE_DIRECTORY = Path.home() / ".cache/ansible-sample-conf/inventories"
+INVENTORY_CACHE_SIZE = 16
+PARALLEL_PARSE_MIN_BYTES = 256 * 1024
 DOCKERFILES_DIRECTORY = "./Dockerfiles"
 DEBUG_LEVEL = 0
+SSH_READY_TIMEOUT = 60
+PORT_BASE = 20000
+PORT_RANGE_SIZE = 1000
+
+_sessions_cache = {"mtime": None, "data": None}
+_session_ports = {}
 
 os.makedirs(TEMP_DIRECTORY, exist_ok=True)
 
 # Helpers
 
+@functools.lru_cache(maxsize=None)
+def _yaml():
+    """Import PyYAML on first use, preferring the libyaml loader and dumper."""
+    import yaml
+    try:
+        from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+    except ImportError:
+        from yaml import SafeLoader as Loader, SafeDumper as Dumper
+    return yaml, Loader, Dumper
+
+def _merge_inventory(dst, src):
+    """Merge the hosts of an inventory into another one, in place."""
+    for key, val in src.items():
+        if key not in dst:
+            dst[key] = val
+            continue
+
+        for group_name, group_content in val.get("children", {}).items():
+            dst_children = dst[key].setdefault("children", {})
+            if group_name not in dst_children:
+                dst_children[group_name] = group_content
+            else:
+                dst_children[group_name].setdefault("hosts", {}).update(group_content.get("hosts", {}))
+
+def _parse_one(path):
+    with open(path, "r") as f:
+        yaml, Loader, _ = _yaml()
+        return yaml.load(f, Loader=Loader)
+
+def _parse_inventory(path_or_file, paths):
+    if not os.path.isdir(path_or_file):
+        return _parse_one(path_or_file)
+
+    data = {}
+
+    # Parsing is CPU bound, spread the files over processes and merge them in order.
+    # Starting the pool costs tens of milliseconds, more than parsing a typical inventory,
+    # so it is only used from PARALLEL_PARSE_MIN_BYTES (256 KiB) of YAML in total.
+    cpus = os.cpu_count() or 1
+    if cpus > 1 and len(paths) > 1 and sum(map(os.path.getsize, paths)) >= PARALLEL_PARSE_MIN_BYTES:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(cpus, len(paths))) as ex:
+            results = list(ex.map(_parse_one, paths))
+    else:
+        results = map(_parse_one, paths)
+
+    for file_data in results:
+        if file_data:
+            _merge_inventory(data, file_data)
+    return data
+
+def _inventory_cache_key(path_or_file, paths):
+    import hashlib
+    h = hashlib.blake2b(os.path.abspath(path_or_file).encode(), digest_size=16)
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0".encode())
+    return h.hexdigest()
+
+def _cache_file_mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _store_cached_inventory(cache_file, data):
+    """Save a parsed inventory to the cache, failures only cost a reparse next time."""
+    import pickle
+    try:
+        os.makedirs(INVENTORY_CACHE_DIRECTORY, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(data, f, protocol=5)
+        os.replace(tmp_file, cache_file)
+
+        # A concurrent start may remove files between the glob and the stat
+        cached = sorted(INVENTORY_CACHE_DIRECTORY.glob("*.pkl"), key=_cache_file_mtime, reverse=True)
+        for old in cached[INVENTORY_CACHE_SIZE:]:
+            old.unlink(missing_ok=True)
+    except OSError as e:
+        logging.debug(f"Could not update the inventory cache: {e}")
+
 def load_inventory(path_or_file):
     """Load inventory from a YAML file or directory of YAML files, merging hosts."""
-    data = {}
+    import pickle
     if os.path.isdir(path_or_file):
-        for filename in os.listdir(path_or_file):
-            if filename.endswith((".yaml", ".yml")):
-                full_path = os.path.join(path_or_file, filename)
-                with open(full_path, "r") as f:
-                    file_data = yaml.safe_load(f)
-                    if file_data:
-                        for key, val in file_data.items():
-                            if key not in data:
-                                data[key] = val
-                            else:
-                                for group_name, group_content in val.get("children", {}).items():
-                                    if "children" not in data[key]:
-                                        data[key]["children"] = {}
-                                    if group_name not in data[key]["children"]:
-                                        data[key]["children"][group_name] = group_content
-                                    else:
-                                        existing_hosts = data[key]["children"][group_name].get("hosts", {})
-                                        new_hosts = group_content.get("hosts", {})
-                                        existing_hosts.update(new_hosts)
-                                        data[key]["children"][group_name]["hosts"] = existing_hosts
+        with os.scandir(path_or_file) as it:
+            paths = [e.path for e in it if e.is_file() and e.name.endswith((".yaml", ".yml"))]
     else:
-        with open(path_or_file, "r") as f:
-            data = yaml.safe_load(f)
+        paths = [path_or_file]
+
+    # Unchanged files (same names, mtimes and sizes) reuse the previously merged result
+    cache_file = INVENTORY_CACHE_DIRECTORY / f"{_inventory_cache_key(path_or_file, paths)}.pkl"
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    data = _parse_inventory(path_or_file, paths)
+    _store_cached_inventory(cache_file, data)
     return data
 
-def generate_docker_compose(data, sessionId):
-    """Generate docker-compose.yml dictionary from inventory data with dynamic subnet."""
-    docker_compose = {"services": {}}
-    root = data.get("test_inv", data)
-    vars = root.get("vars", {})
-    dockerfile = vars.get("dockerfile")
+InventoryView = collections.namedtuple("InventoryView", "root_name vars children hosts_in_order host_vars")
+
+def inventory_view(data):
+    """Flatten inventory data once so the hosts can be walked without the group nesting."""
+    root_name = "test_inv" if "test_inv" in data else None
+    root = data[root_name] if root_name else data
     children = root.get("children", {})
-    built_images = set()
+    hosts_in_order = [
+        (group_name, host, host_vars)
+        for group_name, group in children.items()
+        for host, host_vars in group.get("hosts", {}).items()
+    ]
+
+    # A host listed in several groups is one machine, later listings override earlier ones
+    merged_vars = {}
+    for _, host, host_vars in hosts_in_order:
+        merged_vars.setdefault(host, {}).update(host_vars or {})
+
+    return InventoryView(root_name, root.get("vars", {}), children, hosts_in_order, merged_vars)
+
+# The compose schema is fixed, so it is written from templates rather than through yaml.dump.
+# Scalars are emitted as JSON strings, which are valid YAML and need no further escaping.
+
+def _yaml_list(items, indent):
+    if not items:
+        return " []\n"
+    return "\n" + "".join(f"{indent}- {json.dumps(item)}\n" for item in items)
+
+def _compose_service(host, container_name, image, extra_hosts, network, ip, build=None, ports=None):
+    service = (
+        f"  {json.dumps(host)}:\n"
+        f"    image: {json.dumps(image)}\n"
+        f"    container_name: {json.dumps(container_name)}\n"
+        f"    hostname: {json.dumps(host)}\n"
+        f"    extra_hosts:{_yaml_list(extra_hosts, '    ')}"
+        f"    tmpfs:{_yaml_list(['/run', '/run/lock'], '    ')}"
+        "    networks:\n"
+        f"      {json.dumps(network)}:\n"
+        f"        ipv4_address: {json.dumps(ip)}\n"
+        "    deploy:\n"
+        "      resources:\n"
+        "        limits:\n"
+        "          cpus: \"1.0\"\n"
+        "          memory: \"512M\"\n"
+    )
+    if build:
+        service += (
+            "    build:\n"
+            f"      context: {json.dumps(build['context'])}\n"
+            f"      dockerfile: {json.dumps(build['dockerfile'])}\n"
+            f"      tags:{_yaml_list(build['tags'], '      ')}"
+            f"      cache_from:{_yaml_list(build['cache_from'], '      ')}"
+            "      args:\n"
+            + "".join(f"        {json.dumps(k)}: {json.dumps(v)}\n" for k, v in build["args"].items())
+        )
+    if ports:
+        service += f"    ports:{_yaml_list(ports, '    ')}"
+    return service
+
+def _compose_networks(network, subnet):
+    return (
+        "networks:\n"
+        f"  {json.dumps(network)}:\n"
+        "    driver: bridge\n"
+        "    ipam:\n"
+        "      config:\n"
+        f"      - subnet: {json.dumps(subnet)}\n"
+    )
+
+def build_session_artifacts(inventory, sessionId, compose_path, inventory_path, used_ports=None):
+    """Write the session docker-compose.yml and inventory in one walk, return the jump host port or None."""
+    vars_root = inventory.vars
+    dockerfile = vars_root.get("dockerfile")
+    ansible_pass = vars_root.get("ansible_ssh_pass", "password")
+    ansible_user = vars_root.get("ansible_user", "ubuntu")
 
     try:
         session_num = int(sessionId[1:])
     except ValueError:
         session_num = 0
-    
-    subnet_prefix = f"172.{19 + session_num}" 
-    
-    host_ip_map = {}
-    ip_counter = 2
-    for group in children.values():
-        for host in group.get("hosts", {}).keys():
-            host_ip_map[host] = f"{subnet_prefix}.0.{ip_counter}"
-            ip_counter += 1
+
+    subnet_prefix = f"172.{19 + session_num}"
+    network = f"{sessionId}-cluster-net"
+
+    hosts = [host for _, host, _ in inventory.hosts_in_order]
+    host_ip_map = dict(zip(hosts, (f"{subnet_prefix}.0.{i}" for i in range(2, len(hosts) + 2))))
 
     all_extra_hosts = [f"{name}:{ip}" for name, ip in host_ip_map.items()]
-    
-    for group in children.values():
-        for host, host_vars in group.get("hosts", {}).items():
-            assigned_ip = host_ip_map[host]
-            docker_image = (host_vars.get("dockerfile") if host_vars else None) or dockerfile
-
-            if docker_image and docker_image not in built_images:
-                create_docker_images(docker_image, sessionId)
-                built_images.add(docker_image)
-
-            service_config = {
-                "image": f"{docker_image}:latest",
-                "container_name": f"{sessionId}-{host}",
-                "hostname": host,
-                "extra_hosts": [h for h in all_extra_hosts if not h.startswith(f"{host}:")],
-                "tmpfs": ["/run", "/run/lock"],
-                "networks": {
-                    f"{sessionId}-cluster-net": {
-                        "ipv4_address": assigned_ip
-                    }
-                },
-                "deploy": {
-                    "resources": {
-                        "limits": {"cpus": "1.0", "memory": "512M"}
-                    }
-                },
-            }
+    host_index = {name: i for i, name in enumerate(host_ip_map)}
+    image_tags = {}
+    written_hosts = set()
+    entry_ip = None
+
+    jump_host_base_port = next(
+        (host_vars.get("ansible_port", 22) for host_vars in inventory.host_vars.values()
+         if host_vars.get("is_entry_point") is True),
+        22
+    )
+    jump_port = session_port_offset(jump_host_base_port, sessionId, used_ports)
 
-            if host_vars:
-                if host_vars.get("is_entry_point"):
-                    port = host_vars.get("ansible_port")
-                    update_session(sessionId, entryIp=assigned_ip)
-                    if port:
-                        host_port = session_port_offset(port, sessionId)
-                        service_config["ports"] = [f"{host_port}:22"]
-                    else:
-                        raise ValueError(f"Entry point {host} missing ansible_port")
-
-            docker_compose["services"][host] = service_config
-
-    docker_compose["networks"] = {
-        f"{sessionId}-cluster-net": {
-            "driver": "bridge",
-            "ipam": {
-                "config": [{"subnet": f"{subnet_prefix}.0.0/16"}]
-            }
-        }
+    # Everything but ansible_host is the same for all hosts of a kind, build it once
+    entry_point_vars = {
+        "ansible_host": "127.0.0.1",
+        "ansible_port": jump_port,
+        "ansible_ssh_common_args": "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
     }
-    return docker_compose
+    proxy_cmd = f"ssh -W %h:%p -q {ansible_user}@127.0.0.1 -p {jump_port} -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
+    proxy_args = f"-o ProxyCommand='sshpass -p {ansible_pass} {proxy_cmd}'"
 
-def is_port_open(port):
-    try:
-        with socket.create_connection(("127.0.0.1", port), timeout=1):
-            return True
-    except:
-        return False
+    children = {group_name: {"hosts": {}} for group_name in inventory.children}
+    session_root = {
+        "vars": vars_root.copy(),
+        "children": children
+    }
+
+    with open(compose_path, "w") as f:
+        f.write("services:\n")
+
+        for group_name, host, host_vars in inventory.hosts_in_order:
+            assigned_ip = host_ip_map[host]
+            # The container and its connection vars follow the host, whichever group lists it
+            merged_vars = inventory.host_vars[host]
+            is_entry_point = bool(merged_vars.get("is_entry_point"))
+
+            new_vars = host_vars.copy() if host_vars else {}
+            ports = None
+
+            if is_entry_point:
+                port = merged_vars.get("ansible_port")
+                entry_ip = assigned_ip
+                if port:
+                    host_port = session_port_offset(port, sessionId, used_ports)
+                    ports = [f"{host_port}:22"]
+                else:
+                    raise ValueError(f"Entry point {host} missing ansible_port")
+                new_vars.update(entry_point_vars)
+            else:
+                new_vars.update(ansible_host=host, ansible_port=22, ansible_ssh_common_args=proxy_args)
+
+            children[group_name]["hosts"][host] = new_vars
+
+            # A host listed in several groups is still a single container
+            if host in written_hosts:
+                continue
+            written_hosts.add(host)
+
+            docker_image = merged_vars.get("dockerfile") or dockerfile
+
+            # Only one service per image carries the build, the others reuse its tag
+            build = None
+            if docker_image and docker_image not in image_tags:
+                image_tags[docker_image] = docker_image_tag(docker_image)
+                build = docker_build_config(docker_image)
+            image = image_tags.get(docker_image, f"{docker_image}:latest")
+
+            index = host_index[host]
+            f.write(_compose_service(
+                host, f"{sessionId}-{host}", image,
+                all_extra_hosts[:index] + all_extra_hosts[index + 1:],
+                network, assigned_ip, build, ports
+            ))
+
+        f.write(_compose_networks(network, f"{subnet_prefix}.0.0/16"))
+
+    session_inventory = {inventory.root_name: session_root} if inventory.root_name else session_root
+
+    # Emit straight to UTF-8 bytes and write them in one go, skipping the text layer
+    yaml, _, Dumper = _yaml()
+    Path(inventory_path).write_bytes(
+        yaml.dump(session_inventory, Dumper=Dumper, sort_keys=False, allow_unicode=True, encoding="utf-8")
+    )
+
+    # Without an entry point no port is published, there is nothing to wait for
+    if entry_ip is None:
+        return None
+
+    update_session(sessionId, entryIp=entry_ip)
+    return jump_port
+
+def wait_for_ssh(port, timeout=SSH_READY_TIMEOUT):
+    """Wait until an SSH server sends its banner on a localhost port, return whether it did."""
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while True:
+        # docker-proxy accepts connections before sshd runs, only the banner proves it's up
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                if s.recv(4) == b"SSH-":
+                    return True
+        except OSError:
+            pass
+
+        if time.monotonic() + delay > deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 2)
+
+def local_bound_ports():
+    """Return the local TCP ports in use according to the kernel, or None if unavailable."""
+    ports = set()
+    read_any = False
+    # tcp6 is missing when IPv6 is disabled, the IPv4 table is still worth using
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table, "r") as f:
+                next(f)
+                for line in f:
+                    local_address = line.split()[1]
+                    ports.add(int(local_address.rsplit(":", 1)[1], 16))
+        except OSError:
+            continue
+        read_any = True
+    return ports if read_any else None
 
 def path_exist(path):
     if not Path(path).exists():
@@ -136,6 +363,7 @@ def path_exist(path):
         sys.exit(1)
 
 def check_dependencies():
+    import subprocess
     logging.info("Checking dependencies...")
     dependencies = ["docker", "sshpass", "ansible-playbook"]
     missing = []
@@ -159,6 +387,9 @@ def check_dependencies():
 # logging
 
 def setup_logging(quiet=False, debug=0):
+    global DEBUG_LEVEL
+    DEBUG_LEVEL = debug
+
     if quiet:
         level = logging.ERROR
     elif debug >= 1:
@@ -166,57 +397,101 @@ def setup_logging(quiet=False, debug=0):
     else:
         level = logging.INFO
 
+    # force allows the menu to change the level between commands
     logging.basicConfig(
         level=level,
-        format="%(levelname)s: %(message)s"
+        format="%(levelname)s: %(message)s",
+        force=True
     )
 
-def run_cmd(cmd):
+def run_cmd(cmd, env=None):
+    import subprocess
     logging.debug(f"Running command: {' '.join(cmd)}")
 
     return subprocess.run(
         cmd,
         check=True,
+        env=env,
         stdout=None if DEBUG_LEVEL >= 2 else subprocess.DEVNULL,
         stderr=None if DEBUG_LEVEL >= 2 else subprocess.DEVNULL
     )
 
 # docker images
 
-def create_docker_images(dockerfile, sessionId):
-    image_name = dockerfile
-    dockerfile_path = os.path.join(DOCKERFILES_DIRECTORY, f"Dockerfile.{dockerfile}")
-    logging.info(f"Building docker image '{dockerfile}'")
-    run_cmd(["docker", "build", "-t", image_name, "-f", dockerfile_path, "."])
+def _dockerfile_path(dockerfile):
+    return os.path.abspath(os.path.join(DOCKERFILES_DIRECTORY, f"Dockerfile.{dockerfile}"))
+
+def docker_image_tag(dockerfile):
+    """Tag images by Dockerfile content, so an edited Dockerfile gets built under a new tag."""
+    import hashlib
+    digest = hashlib.blake2b(Path(_dockerfile_path(dockerfile)).read_bytes(), digest_size=6).hexdigest()
+    return f"{dockerfile}:{digest}"
+
+def docker_build_config(dockerfile):
+    image_name = f"{dockerfile}:latest"
+    return {
+        "context": os.path.abspath("."),
+        "dockerfile": _dockerfile_path(dockerfile),
+        "tags": [image_name],
+        "cache_from": [image_name],
+        "args": {"BUILDKIT_INLINE_CACHE": "1"},
+    }
 
 # session
 
+@functools.lru_cache(maxsize=64)
+def _compose_path(sessionId):
+    return TEMP_DIRECTORY / f"docker-compose-{sessionId}.yml"
+
+@functools.lru_cache(maxsize=64)
+def _inventory_path(sessionId):
+    return TEMP_DIRECTORY / f"inventory-{sessionId}.yml"
+
+def _load_sessions():
+    """Return the session file content as {"_next": int, "sessions": {...}}, or None."""
+    try:
+        mtime = MEMO_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if _sessions_cache["mtime"] == mtime:
+        return _sessions_cache["data"]
+
+    try:
+        data = _json_loads(MEMO_FILE.read_bytes())
+    except json.JSONDecodeError:
+        data = None
+
+    # Older files stored the sessions at the top level, without the counter
+    if isinstance(data, dict) and "sessions" not in data:
+        numbers = [int(s[1:]) for s in data if s.startswith("S") and s[1:].isdigit()]
+        data = {"_next": max(numbers, default=0) + 1, "sessions": data}
+
+    _sessions_cache["mtime"] = mtime
+    _sessions_cache["data"] = data
+    return data
+
+def _save_sessions(data):
+    MEMO_FILE.write_bytes(_json_dumps(data))
+
+    _sessions_cache["mtime"] = MEMO_FILE.stat().st_mtime_ns
+    _sessions_cache["data"] = data
+
 def create_session(path):
-    sessions = {}
-
-    if os.path.exists(MEMO_FILE):
-        with open(MEMO_FILE, "r") as f:
-            try:
-                sessions = json.load(f)
-            except json.JSONDecodeError:
-                sessions = {}
-
-    if sessions:
-        numbers = [int(s[1:]) for s in sessions if s.startswith("S") and s[1:].isdigit()]
-        next_number = max(numbers) + 1 if numbers else 1
-    else:
-        next_number = 1
+    data = _load_sessions() or {"_next": 1, "sessions": {}}
 
+    next_number = data.get("_next", 1)
     new_session = f"S{next_number:02d}"
-    sessions[new_session] = {"path": path}
+    data["_next"] = next_number + 1
+    data["sessions"][new_session] = {"path": path}
 
-    with open(MEMO_FILE, "w") as f:
-        json.dump(sessions, f)
+    _save_sessions(data)
 
     return new_session
 
 def update_session(sessionId, path=None, entryIp=None):
-    sessions = get_all_sessions() or {}
+    data = _load_sessions() or {"_next": 1, "sessions": {}}
+    sessions = data["sessions"]
     session_data = sessions.get(sessionId, {"path": None, "entryIp": "0.0.0.0"})
 
     if path is not None: session_data["path"] = path
@@ -224,87 +499,52 @@ def update_session(sessionId, path=None, entryIp=None):
 
     sessions[sessionId] = session_data
 
-    with open(MEMO_FILE, "w") as f:
-        json.dump(sessions, f, indent=2)
+    _save_sessions(data)
+
+def remove_session(sessionId):
+    data = _load_sessions()
+    if data and data["sessions"].pop(sessionId, None) is not None:
+        _save_sessions(data)
 
 def get_session(sessionId):
-    if os.path.exists(MEMO_FILE):
-        with open(MEMO_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                return data.get(sessionId)
-            except json.JSONDecodeError:
-                return None
-    return None
+    data = _load_sessions()
+    return data["sessions"].get(sessionId) if data else None
 
 def get_all_sessions():
-    if os.path.exists(MEMO_FILE):
-        with open(MEMO_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                return data
-            except json.JSONDecodeError:
-                return None
-    return None
-
-def generate_session_inventory(data, sessionId, output_path):
-    root_name = "test_inv" if "test_inv" in data else None
-    root = data[root_name] if root_name else data
-    vars_root = root.get("vars", {})
-    ansible_pass = vars_root.get("ansible_ssh_pass", "password")
-    
-    jump_host_base_port = 22
-    for group in root.get("children", {}).values():
-            for host_name, host_vars in group.get("hosts", {}).items():
-                if host_vars and host_vars.get("is_entry_point") is True:
-                    jump_host_base_port = host_vars.get("ansible_port", 22)
-                    break
-    
-    jump_port = session_port_offset(jump_host_base_port, sessionId)
-    ansible_user = vars_root.get("ansible_user", "ubuntu")
-
-    session_root = {
-        "vars": {**vars_root},
-        "children": {}
-    }
-
-    for group_name, group in root.get("children", {}).items():
-        session_root["children"][group_name] = {"hosts": {}}
-
-        for host, host_vars in group.get("hosts", {}).items():
-            if host_vars:
-                new_vars = {**host_vars}
-            else:
-                new_vars = {}
-
-            if host_vars and host_vars.get("is_entry_point"):
-                new_vars["ansible_host"] = "127.0.0.1"
-                new_vars["ansible_port"] = jump_port
-                new_vars["ansible_ssh_common_args"] = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
-            else:
-                new_vars["ansible_host"] = host
-                new_vars["ansible_port"] = 22
-
-                proxy_cmd = f"ssh -W %h:%p -q {ansible_user}@127.0.0.1 -p {jump_port} -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
-                new_vars["ansible_ssh_common_args"] = f"-o ProxyCommand='sshpass -p {ansible_pass} {proxy_cmd}'"
-
-            session_root["children"][group_name]["hosts"][host] = new_vars
-
-    session_inventory = {root_name: session_root} if root_name else session_root
-
-    with open(output_path, "w") as f:
-        yaml.dump(session_inventory, f, sort_keys=False)
-
-def session_port_offset(base_port, sessionId):
-    port = base_port + (int(sessionId[1:]) - 1) * 100
-    while is_port_open(port):
-        port += 10
-    return port
+    data = _load_sessions()
+    return data["sessions"] if data else None
+
+def session_port_offset(base_port, sessionId, used_ports=None):
+    """Map an inventory port into the port range reserved for the session."""
+    # The jump port and the published port are asked for separately, they must agree
+    assigned = _session_ports.setdefault(sessionId, {})
+    if base_port in assigned:
+        return assigned[base_port]
+
+    session_num = int(sessionId[1:])
+    range_start = PORT_BASE + session_num * PORT_RANGE_SIZE
+    if range_start + PORT_RANGE_SIZE > 65536:
+        raise ValueError(f"No port range available for session {sessionId}")
+
+    # Deterministic, only ports already bound on the host or given to another base port
+    # of the session (e.g. 2220 and 3220) shift it within the range
+    offset = (base_port + session_num) % PORT_RANGE_SIZE
+    taken = set(assigned.values())
+    for i in range(PORT_RANGE_SIZE):
+        port = range_start + (offset + i) % PORT_RANGE_SIZE
+        if port not in taken and (used_ports is None or port not in used_ports):
+            assigned[base_port] = port
+            if used_ports is not None:
+                used_ports.add(port)
+            return port
+    raise ValueError(f"No free port left for session {sessionId}")
 
 # Functions link to command
 
-def start(inventory):
+def start(inventory, force_build=False):
+    import subprocess
     logging.debug(f"Using inventory: {inventory}")
+    os.makedirs(TEMP_DIRECTORY, exist_ok=True)
     sessionId = create_session(inventory)
     logging.info(f"Your session id is {sessionId}")
 
@@ -313,33 +553,51 @@ def start(inventory):
         data = load_inventory(inventory)
     except Exception:
         logging.exception("Error reading inventory")
+        remove_session(sessionId)
         sys.exit(1)
 
-    logging.debug("Generating docker-compose.yml...")
-    docker_compose = generate_docker_compose(data, sessionId)
-
-    logging.debug("Generating session inventory...")
-    session_inventory_path = f"{TEMP_DIRECTORY}/inventory-{sessionId}.yml"
-    generate_session_inventory(data, sessionId, session_inventory_path)
+    inventory_data = inventory_view(data)
+    used_ports = local_bound_ports()
+    # Session ids are reused after stop, the menu must not keep the ports of an older one
+    _session_ports.pop(sessionId, None)
 
-    update_session(sessionId, session_inventory_path)
+    logging.debug("Generating docker-compose.yml and session inventory...")
+    session_inventory_path = _inventory_path(sessionId)
+    try:
+        jump_port = build_session_artifacts(
+            inventory_data, sessionId, _compose_path(sessionId), session_inventory_path, used_ports
+        )
+    except (ValueError, OSError) as e:
+        logging.error(f"Error generating session files: {e}")
+        # Nothing was started, don't leave a session for stop to tear down
+        remove_session(sessionId)
+        sys.exit(1)
 
-    with open(f"{TEMP_DIRECTORY}/docker-compose-{sessionId}.yml", "w") as f:
-        yaml.dump(docker_compose, f, sort_keys=False)
+    update_session(sessionId, str(session_inventory_path))
 
+    # Compose builds images whose Dockerfile tag is missing, existing ones only on request
     logging.info("Starting containers...")
+    env = {**os.environ, "DOCKER_BUILDKIT": "1", "COMPOSE_DOCKER_CLI_BUILD": "1"}
     try:
         run_cmd([
                 "docker", "compose",
                 "-p", sessionId.lower(),
-                "-f", f"{TEMP_DIRECTORY}/docker-compose-{sessionId}.yml",
-                "up", "-d", "--build"
-            ])
+                "-f", str(_compose_path(sessionId)),
+                "up", "-d", *(["--build"] if force_build else [])
+            ], env=env)
     except subprocess.CalledProcessError:
         logging.error("Error starting Docker containers")
         sys.exit(1)
 
+    if jump_port is None:
+        return
+
+    logging.info("Waiting for SSH on the entry point...")
+    if not wait_for_ssh(jump_port):
+        logging.warning(f"SSH is not answering on the entry point port {jump_port}")
+
 def run(inventory, test_path, sessionId):
+    import subprocess
     sessions = get_all_sessions()
 
     if not sessions:
@@ -373,16 +631,33 @@ def run(inventory, test_path, sessionId):
         subprocess.run(["ansible", "all", "-m", "ping", "-i", inventory])
 
 def stop():
+    from concurrent.futures import ThreadPoolExecutor
     sessions = get_all_sessions()
     if (sessions):
         for s in sessions:
             logging.info(f"Cleaning up session {s}")
-            run_cmd([
-                "docker", "compose",
-                "-p", s.lower(),
-                "-f", f"{TEMP_DIRECTORY}/docker-compose-{s}.yml",
-                "down"
-            ])
+
+        # A session without compose file never started any container, nothing to tear down
+        started = [s for s in sessions if _compose_path(s).exists()]
+
+        # Sessions are independent compose projects, tear them down concurrently
+        with ThreadPoolExecutor(max_workers=min(8, len(started) or 1)) as ex:
+            futures = {
+                s: ex.submit(run_cmd, [
+                    "docker", "compose",
+                    "-p", s.lower(),
+                    "-f", str(_compose_path(s)),
+                    "down"
+                ])
+                for s in started
+            }
+
+        failed = [s for s, future in futures.items() if future.exception() is not None]
+        if failed:
+            # Keep the session files so stop can be retried
+            logging.error(f"Error stopping session(s) {', '.join(failed)}")
+            sys.exit(1)
+
         logging.debug("Removing temp directory")
         shutil.rmtree(TEMP_DIRECTORY)
         
@@ -398,6 +673,15 @@ def sessions(verbose):
 # Main function
 
 def main():
+    argv = sys.argv[1:]
+
+    # Listing sessions only reads the session file, skip argparse and the dependency checks
+    if argv and argv[0] == "sessions" and set(argv[1:]) <= {"-v", "--verbose"}:
+        sessions(len(argv) > 1)
+        return
+
+    import argparse
+
     parent_parser = argparse.ArgumentParser(add_help=False)
     parent_parser.add_argument("-q", "--quiet", help="Only print errors", action="store_true")
     parent_parser.add_argument("-d", "--debug", type=int, default=0, metavar="N", help="Debug level (0=info, 1=verbose, 2=commands output)")
@@ -411,6 +695,7 @@ def main():
     # START
     start_parser = subparsers.add_parser("start", help="Start the virtual cluster", parents=[parent_parser])
     start_parser.add_argument("-i", "--inventory", required=True, help="Inventory YAML file or directory path")
+    start_parser.add_argument("--force-build", help="Rebuild the docker images even if they already exist", action="store_true")
 
     # RUN
     run_parser = subparsers.add_parser("run", help="Run playbook or ping hosts", parents=[parent_parser])
@@ -432,15 +717,13 @@ def main():
     TEST_PATH = getattr(args, "test", None)
     sessionId = getattr(args, "session", None)
 
-    global DEBUG_LEVEL
-    DEBUG_LEVEL = args.debug
     setup_logging(args.quiet, args.debug)
 
     check_dependencies()
 
     if args.command == "start":
         path_exist(INVENTORY)
-        start(INVENTORY)
+        start(INVENTORY, args.force_build)
     elif args.command == "run":
         if INVENTORY: path_exist(INVENTORY)
         if TEST_PATH: path_exist(TEST_PATH)
@@ -1,18 +1,37 @@
 #!/usr/bin/env python3
 
 from simple_term_menu import TerminalMenu
-import subprocess
 import os
-import sys
-import glob
 import readline
-from cluster import get_all_sessions
+import logging
+from cluster import get_all_sessions, setup_logging, check_dependencies, path_exist
+from cluster import start as cluster_start, run as cluster_run, stop as cluster_stop, sessions as cluster_sessions
 
-CLUSTER_SCRIPT = "cluster.py"
 BOLD = "\033[1m"
 RESET = "\033[0m"
 LOGGING_ARGS = ["-d", "0"]
 
+LOGGING_OPTIONS = [
+    "q - Only print errors",
+    "0 - Info",
+    "1 - Verbose",
+    "2 - Commands output"
+]
+
+LOGGING_ARGS_MAP = [
+    ["-q"],
+    ["-d", "0"],
+    ["-d", "1"],
+    ["-d", "2"]
+]
+
+# Menus are reused between calls as long as their entries don't change
+_logging_menu = None
+_session_menu = None
+_session_menu_options = None
+_completion_cache = {"key": None, "results": []}
+_dependencies_checked = False
+
 # Helpers
 def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
@@ -21,6 +40,8 @@ def bold(text):
     return f"{BOLD}{text}{RESET}"
 
 def select_session_menu():
+    global _session_menu, _session_menu_options
+
     sessions = get_all_sessions()
     if not sessions:
         print("No active sessions.")
@@ -31,12 +52,14 @@ def select_session_menu():
         for sid, path in sessions.items()
     ]
 
-    menu = TerminalMenu(
-        options,
-        title="Select a session (verbose)"
-    )
+    if _session_menu is None or options != _session_menu_options:
+        _session_menu = TerminalMenu(
+            options,
+            title="Select a session (verbose)"
+        )
+        _session_menu_options = options
 
-    index = menu.show()
+    index = _session_menu.show()
     if index is None:
         return None
 
@@ -45,23 +68,27 @@ def select_session_menu():
 def complete_path(text, state):
     line = readline.get_line_buffer() or ''
 
-    glob_pattern = line + '*'
-    matches = glob.glob(glob_pattern)
-    matches = [m + '/' if os.path.isdir(m) else m for m in matches]
+    last_slash = line.rfind('/')
+    dirpath, prefix = line[:last_slash + 1], line[last_slash + 1:]
+    scan_dir = dirpath or '.'
 
-    results = []
+    try:
+        key = (dirpath, prefix, os.stat(scan_dir).st_mtime_ns)
+    except OSError:
+        return None
 
-    if '/' in line:
-        last_slash = line.rfind('/')
-        prefix = line[:last_slash + 1]
+    # readline calls us once per state, only scan the directory on the first one
+    if key != _completion_cache["key"]:
+        with os.scandir(scan_dir) as it:
+            results = sorted(
+                dirpath + e.name + ('/' if e.is_dir() else '')
+                for e in it
+                if e.name.startswith(prefix) and (prefix.startswith('.') or not e.name.startswith('.'))
+            )
+        _completion_cache["key"] = key
+        _completion_cache["results"] = results
 
-        for m in matches:
-            if m.startswith(prefix):
-                results.append(prefix + m[len(prefix):])
-    else:
-        results = matches
-
-    results = sorted(results)
+    results = _completion_cache["results"]
 
     return results[state] if state < len(results) else None
 
@@ -69,16 +96,32 @@ readline.set_completer_delims(" \t\n")
 readline.set_completer(complete_path)
 readline.parse_and_bind("tab: complete")
 
-def run_cluster_command(command, extra_args=[]):
-    cmd = [sys.executable, "cluster.py"] + LOGGING_ARGS + [command] + extra_args
-    subprocess.run(cmd)
+def run_cluster_command(command, *args, paths=()):
+    """Run a cluster.py command in-process, with the same checks as its CLI."""
+    global _dependencies_checked
+
+    quiet = LOGGING_ARGS == ["-q"]
+    setup_logging(quiet, 0 if quiet else int(LOGGING_ARGS[-1]))
+
+    # cluster.py reports errors with sys.exit, neither those nor unexpected errors may close the menu
+    try:
+        if not _dependencies_checked:
+            check_dependencies()
+            _dependencies_checked = True
+        for path in paths:
+            path_exist(path)
+        command(*args)
+    except SystemExit:
+        pass
+    except Exception:
+        logging.exception("Command failed")
 
 # Commands
 
 def start_cluster():
     inventory = input(bold("Path to inventory file or directory: ")).strip()
     if inventory:
-        run_cluster_command("start", ["-i", inventory])
+        run_cluster_command(cluster_start, inventory, paths=[inventory])
 
 def run_cluster():
     inventory = input(bold("Inventory path (leave empty to reuse session inventory): ")).strip()
@@ -98,57 +141,40 @@ def run_cluster():
         if not session:
             return
 
-    args = []
+    paths = [path for path in (inventory, test) if path]
 
-    if inventory:
-        args.extend(["-i", inventory])
-    if test:
-        args.extend(["-t", test])
-
-    run_cluster_command("run", ["-s", session] + args)
+    run_cluster_command(cluster_run, inventory or None, test or None, session, paths=paths)
 
 def stop_cluster():
-    run_cluster_command("stop")
+    run_cluster_command(cluster_stop)
 
 def show_sessions():
     verbose = input(bold("Verbose output? (y/N): ")).strip().lower()
-    args = []
-    if verbose == "y":
-        args.append("--verbose")
-    run_cluster_command("sessions", args)
+    run_cluster_command(cluster_sessions, verbose == "y")
 
 def choose_logging():
-    global LOGGING_ARGS
-
-    logging_options = [
-        "q - Only print errors",
-        "0 - Info",
-        "1 - Verbose",
-        "2 - Commands output"
-    ]
-
-    logging_args_map = [
-        ["-q"],
-        ["-d", "0"],
-        ["-d", "1"],
-        ["-d", "2"]
-    ]
-
-    try:
-        default_index = logging_args_map.index(LOGGING_ARGS)
-    except ValueError:
-        default_index = 1
-
-    menu = TerminalMenu(
-        logging_options,
-        title="Choose logging level (applied to all commands)",
-        menu_cursor_style=("fg_red", "bold"),
-        cursor_index=default_index
-    )
-    
-    choice = menu.show()
+    global LOGGING_ARGS, _logging_menu
+
+    if _logging_menu is None:
+        try:
+            default_index = LOGGING_ARGS_MAP.index(LOGGING_ARGS)
+        except ValueError:
+            default_index = 1
+
+        _logging_menu = TerminalMenu(
+            LOGGING_OPTIONS,
+            title="Choose logging level (applied to all commands)",
+            menu_cursor_style=("fg_red", "bold"),
+            cursor_index=default_index
+        )
+
+    # After a choice the cursor rests on the new level, the menu can be shown again as is.
+    # Esc leaves it wherever the user moved it, rebuild it next time to start on the current level.
+    choice = _logging_menu.show()
     if choice is not None:
-        LOGGING_ARGS = logging_args_map[choice]
+        LOGGING_ARGS = LOGGING_ARGS_MAP[choice]
+    else:
+        _logging_menu = None
 
 def main():
     script_options = [